@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/python3
+
+# Memory benchmark for narrator.summarizer()
+# Builds a synthetic tweet corpus and reports the peak memory a summary run allocates
+# on top of the corpus itself, as measured by tracemalloc.
+#
+# Usage: python benchmarks/summarizer_memory.py --rows 1000000
+import argparse
+import contextlib
+import io
+import os
+import random
+import sys
+import time
+import tracemalloc
+import pandas as pd
+
+# Run against this checkout's narrator, not an installed copy
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import narrator
+
+HASHTAGS = ['#familyseparation', '#familiesbelongtogether', '#felipegomez', '#keepfamiliestogether',
+            '#maquin', '#noborderwall', '#shutdownstories', '#trumpshutdown', '#wherearethechildren',
+            '#buildthewall', '#maga', '#kag']
+
+def build_corpus(rows, seed=0):
+    rng = random.Random(seed)
+    dates = ['2019-01-%02d' % d for d in range(1, 29)]
+    return pd.DataFrame({
+        'id': range(rows),
+        'date': [dates[i % len(dates)] for i in range(rows)],
+        'hashtags': [str(rng.sample(HASHTAGS, rng.randint(1, 3))) if i % 4 else None for i in range(rows)],
+        'tweet': ['tweet text number %d about the border wall' % i for i in range(rows)]
+    })
+
+def measure(label, corpus_bytes, func):
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        func()
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print('%-22s peak %8.1f MB  (%.2fx corpus)  %6.2f s' % (label, peak / 2**20, peak / corpus_bytes, seconds))
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure peak summarizer() memory on a synthetic corpus.')
+    parser.add_argument('--rows', type=int, default=1000000)
+    args = parser.parse_args()
+
+    df = build_corpus(args.rows)
+    corpus_bytes = df.memory_usage(deep=True).sum()
+    print('Corpus: %d rows, %.1f MB' % (args.rows, corpus_bytes / 2**20))
+
+    periods = narrator.period_dates_writer(ranges=[['1', ['2019-01-01', '2019-01-14']], ['2', ['2019-01-15', '2019-01-28']]])
+    common = dict(column_type='hashtags', df_corpus=df, primary_col='hashtags', sort_check=True,
+                  sort_date_check=False, sort_type=True, sample_check=False, sample_size=None)
+
+    measure('sum_all_col', corpus_bytes, lambda: narrator.summarizer(main_sum_option='sum_all_col', **common))
+    measure('grouped_terms_perday', corpus_bytes, lambda: narrator.summarizer(
+        main_sum_option='grouped_terms_perday',
+        group_search_option='single_col',
+        simple_list=HASHTAGS[:6],
+        date_col='date',
+        id_col='id',
+        skeleton=narrator.skeletor(aggregate_level='period', date_range=periods, keys=HASHTAGS[:6]),
+        time_agg_type='period',
+        period_dates=periods,
+        grouped_output_type='spread',
+        **common
+    ))
+
+if __name__ == '__main__':
+    main()
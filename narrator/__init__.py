@@ -1 +1,2 @@
 from .narrator import *
+from .pipeline import run_pipeline, load_pipeline_spec
@@ -11,11 +11,12 @@
 # It functions only with Python 3.x and is not backwards-compatible.
 
 # Warning: narrator performs very little custom error-handling, so make sure your inputs are formatted properly! If you have questions, please let me know via email.
-from os import listdir
+from os import listdir, makedirs
 from os.path import isfile, join
 import arrow
 import ast
 import csv
+import json
 import pandas as pd
 from collections import Counter
 import numpy as np
@@ -26,6 +27,13 @@ import re
 import emoji
 import string
 import math
+import heapq
+import itertools
+import warnings
+import unicodedata
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from concurrent.futures import ThreadPoolExecutor
+from statistics import NormalDist
 
 '''
     See README.md for an overview and comments for extended explanation.
@@ -43,6 +51,108 @@ class topperObject:
         self.top_x_rts = top_x_rts
         self.period_dates = period_dates
 
+class topCounter:
+    '''a bounded counter that keeps the top tallies of a stream with a Space-Saving min-heap'''
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.counts = {}
+        self.errors = {} # Overcount bound per term, inherited from the tally it replaced
+        self.evicted = 0
+        self.heap = []
+        self.order = itertools.count() # Breaks heap ties without comparing terms
+
+    def add(self, term, n=1):
+        if term in self.counts:
+            self.counts[term] += n
+        elif len(self.counts) < self.capacity:
+            self.counts[term] = n
+            self.errors[term] = 0
+        else:
+            # Evict the lowest tally; the new term inherits it as its error bound
+            low_term, low_count = self._pop_min()
+            del self.counts[low_term]
+            del self.errors[low_term]
+            self.counts[term] = low_count + n
+            self.errors[term] = low_count
+            self.evicted += 1
+        heapq.heappush(self.heap, (self.counts[term], next(self.order), term))
+        # Drop stale heap entries so the heap stays bounded by capacity
+        if len(self.heap) > 4 * self.capacity:
+            self.heap = [(c, next(self.order), t) for t, c in self.counts.items()]
+            heapq.heapify(self.heap)
+
+    def _pop_min(self):
+        while True:
+            count, _, term = heapq.heappop(self.heap)
+            if self.counts.get(term) == count:
+                return term, count
+
+    def top(self, x):
+        ranked = sorted(self.counts.items(), key=lambda c: c[1], reverse=True)
+        return [(t, c, self.errors[t]) for t, c in ranked[:x]]
+
+    def guaranteed(self, x):
+        '''the top X entries whose lower bound beats every tally outside the top X'''
+        ranked = self.top(len(self.counts))
+        bound = ranked[x][1] if len(ranked) > x else 0
+        return [r for r in ranked[:x] if r[1] - r[2] >= bound]
+
+class termNormalizer:
+    '''an object class that normalizes each distinct term once and compiles search terms into hashed term IDs'''
+    def __init__(self, casefold=True, strip_hash=False, nfkc=True, preprocess=None):
+        self.casefold = casefold
+        self.strip_hash = strip_hash
+        self.nfkc = nfkc
+        self.preprocess = preprocess # Optional function run first, e.g. canonical_url()
+        self.lookup = {} # Raw term to term ID
+        self.vocab = {} # Normalized term to term ID
+        self.forms = [] # Term ID to normalized term
+
+    def normalize(self, term):
+        term = term.strip() if self.preprocess is None else self.preprocess(term)
+        if self.nfkc:
+            term = unicodedata.normalize('NFKC', term)
+        if self.casefold:
+            term = term.casefold()
+            if self.nfkc:
+                term = unicodedata.normalize('NFKC', term)
+        if self.strip_hash:
+            term = term.lstrip('#')
+        return term
+
+    def term_id(self, term):
+        tid = self.lookup.get(term)
+        if tid is None:
+            form = self.normalize(term)
+            tid = self.vocab.get(form)
+            if tid is None:
+                tid = len(self.forms)
+                self.vocab[form] = tid
+                self.forms.append(form)
+            self.lookup[term] = tid
+        return tid
+
+    def label(self, term):
+        return self.forms[self.term_id(term)]
+
+    def compile(self, terms):
+        query = {}
+        collisions = []
+        for t in terms:
+            tid = self.term_id(t)
+            if tid not in query:
+                query[tid] = t
+            elif query[tid] != t:
+                collisions.append(repr(t) + ' as ' + repr(query[tid]))
+        # Only the first spelling of a normalized form receives its counts
+        if len(collisions) > 0:
+            warnings.warn('Search terms normalize to the same form, so they count under the first spelling: ' +
+                ', '.join(collisions) + '. List one spelling per term.')
+        return query
+
+    def match(self, term, query):
+        return query.get(self.term_id(term))
+
 ##################################################################
 
 ## General Functions
@@ -99,6 +209,103 @@ def period_dates_writer(topperObject=None, **kwargs):
 
 ##################################################################
 
+## URL FUNCTIONS
+
+##################################################################
+
+# Number of distinct URLs whose parsed forms are memoized
+URL_CACHE_SIZE = 2**17
+
+# Query parameters that only track clicks and do not change the linked content
+TRACKING_PARAMS = ['fbclid', 'gclid', 'dclid', 'msclkid', 'yclid', 'igshid', 'mc_cid', 'mc_eid',
+                   '_ga', '_hsenc', '_hsmi', 'ref_src', 'ref_url', 'cmpid', 'smid', 'smtyp']
+TRACKING_PREFIXES = ['utm_']
+
+# Ports dropped from canonical URLs, per their original scheme
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+'''
+    canonical_url: Normalizes a URL so scheme and tracking variants count as one URL.
+        Folds http into https, lowercases the host, drops 'www.', the original scheme's default port, fragments,
+        trailing slashes and tracking parameters, and sorts the remaining query parameters.
+        Results are memoized per distinct URL with a bounded LRU cache (URL_CACHE_SIZE),
+        so parsing cost follows the number of distinct URLs, not their occurrences.
+    - Args:
+        - url= String. URL to normalize.
+    - Returns String of the canonical URL. Unparseable URLs return stripped but otherwise unchanged.
+'''
+@functools.lru_cache(maxsize=URL_CACHE_SIZE)
+def canonical_url(url):
+    url = url.strip()
+    try:
+        parts = urlsplit(url)
+        port = parts.port
+    except ValueError:
+        return url
+    if parts.hostname is None:
+        return url
+
+    scheme = parts.scheme.lower()
+    default_port = DEFAULT_PORTS.get(scheme)
+    if scheme == 'http':
+        scheme = 'https'
+    host = parts.hostname
+    if host.startswith('www.'):
+        host = host[4:]
+    if ':' in host:
+        host = '[' + host + ']' # IPv6 hosts keep their brackets
+    if port is not None and port != default_port:
+        host = host + ':' + str(port)
+
+    path = parts.path
+    if len(path) > 1 and path.endswith('/'):
+        path = path.rstrip('/')
+    elif path == '':
+        path = '/'
+
+    query = [q for q in parse_qsl(parts.query, keep_blank_values=True)
+             if q[0].lower() not in TRACKING_PARAMS
+             and not any(q[0].lower().startswith(t) for t in TRACKING_PREFIXES)]
+    return urlunsplit((scheme, host, path, urlencode(sorted(query)), ''))
+
+'''
+    url_domain: Rolls a URL up to its domain, e.g. 'https://www.NYTimes.com/2019/...' to 'nytimes.com'.
+        Memoized per distinct URL like canonical_url().
+    - Args:
+        - url= String. URL to roll up.
+    - Returns String of the lowercased domain without 'www.'. Unparseable URLs return stripped but otherwise unchanged.
+'''
+@functools.lru_cache(maxsize=URL_CACHE_SIZE)
+def url_domain(url):
+    url = url.strip()
+    try:
+        host = urlsplit(url).hostname
+    except ValueError:
+        return url
+    if host is None:
+        return url
+    if host.startswith('www.'):
+        host = host[4:]
+    return host
+
+'''
+    url_normalizer: Helper function for summarizer(). Returns the URL normalizing function for a url_option.
+    - Args:
+        - url_option= String or None. Options include:
+            - 'canonical': Count canonical URLs with canonical_url()
+            - 'domain': Count domains with url_domain()
+            - None: Count raw URL strings
+    - Returns function or None.
+'''
+def url_normalizer(url_option):
+    if url_option == 'canonical':
+        return canonical_url
+    elif url_option == 'domain':
+        return url_domain
+    return None
+
+##################################################################
+
 ## SUMMARIZER FUNCTIONS
 
 ##################################################################
@@ -299,28 +506,33 @@ def find_term(search, text):
         - checker= String. Options for accumulation:
             - simple: Takes values from simple_list and conducts a search on primary_col.
             - keyed: Takes values from keyed_list and conducts a search on secondary_col.
-        - df_list= List. DataFrame passed as a list for traversing
+        - df_list= List or iterable of rows, e.g. from iter_rows(), for traversing
         - check_list= List. List of terms to accrue and append
             - If simple, converted to List of each listed term.
             - If keyed, List of dicts, where each key is its accompanying primary_col term.
+        - normalizer= Optional termNormalizer for simple terms. Default matches exact terms.
     - Returns a hydrated list of Tuples with each primary term and its accompanying date.
 '''
-def accumulator(checker, df_list, check_list):
+def accumulator(checker, df_list, check_list, normalizer=None):
     if checker == 'simple':
         print('Started accumulating content with simple listed terms.')
+        if normalizer is None:
+            normalizer = termNormalizer(casefold=False, nfkc=False)
+        check_query = normalizer.compile(check_list)
         terms_and_dates = []
         for h in df_list:
             ht = ast.literal_eval(h[1])
             if type(ht) is not float:
-                ht = [n.strip() for n in ht]
+                # Swap each term for its check_list term, or None
+                ht = [normalizer.match(n, check_query) for n in ht]
                 if len(ht) > 1:
                     for i in ht:
                         # Check if in check_list
-                        if i in check_list:
+                        if i is not None:
                             # Append primary term and date
                             terms_and_dates.append( (i, h[0], int(float(h[2]))) )
                 elif len(ht) == 1:
-                    if ht[0] in check_list:
+                    if ht[0] is not None:
                         # Append primary term and date
                         terms_and_dates.append( (ht[0], h[0], int(float(h[2]))) )
         print('Accumulating content with simple listed terms complete.')
@@ -345,6 +557,45 @@ def accumulator(checker, df_list, check_list):
         print('Accumulating content with keyed terms complete.')
         return keywords_and_dates
 
+'''
+    clean_row_index: Helper function for summarizer(). Masks out null values and, for hashtags or URLs,
+        values without a '#' or 'http', as combined boolean masks over the corpus.
+    - Args:
+        - df_corpus= DataFrame of tweet corpus
+        - primary_col= String. Name of the primary targeted DataFrame column of interest.
+        - column_type= String. 'hashtags', 'urls' or 'other'.
+    - Returns numpy array of the kept row positions.
+'''
+def clean_row_index(df_corpus, primary_col, column_type):
+    col = df_corpus[primary_col]
+    mask = col.notnull().values
+    if column_type == 'hashtags':
+        mask = mask & col.str.contains('#', regex=False, na=False).values
+    elif column_type == 'urls':
+        mask = mask & col.str.contains('http', regex=False, na=False).values
+    return np.flatnonzero(mask)
+
+'''
+    iter_rows: Helper function for summarizer(). Reads columns of the corpus row by row at the given positions,
+        a chunk at a time, so only one chunk of column values is ever gathered at once.
+    - Args:
+        - df_corpus= DataFrame of tweet corpus
+        - columns= List of column names to read.
+        - rows= numpy array of row positions from clean_row_index(), or None for every row.
+        - chunk_size= Integer of rows gathered per chunk. Default is 65536.
+    - Returns generator of row Tuples in the order of columns.
+'''
+def iter_rows(df_corpus, columns, rows=None, chunk_size=65536):
+    arrays = [df_corpus[c].values for c in columns]
+    total = len(df_corpus) if rows is None else len(rows)
+    for start in range(0, total, chunk_size):
+        if rows is None:
+            chunk = [a[start:start + chunk_size] for a in arrays]
+        else:
+            chunk = [a[rows[start:start + chunk_size]] for a in arrays]
+        for row in zip(*chunk):
+            yield row
+
 '''
     summarizer: Counts a column variable of interest and returns a sample data set
         based on set parameters. There are 5 search options from which to choose.
@@ -386,48 +637,62 @@ def accumulator(checker, df_list, check_list):
             - grouped_output_type= String. Options for particular Dataframe output
                 - consolidated= Each listed value in group is a column with its period values
                 - spread= One column for each listed group value
+                - dict= The hydrated group Dict itself, without building a DataFrame, e.g. for d3_exporter()
+            - url_option= String. If column_type is 'urls', how to count them. Search terms are normalized the same way.
+                - None: Count raw URL strings (Default)
+                - 'canonical': Count canonical URLs without tracking parameters or scheme variants
+                - 'domain': Count per domain
+            - normalize_terms= Boolean or Dict of termNormalizer options, e.g. {'strip_hash': True}. If set, terms match
+                after NFKC normalization and casefolding, so '#BuildTheWall' counts as '#buildthewall'. Matches count under
+                their simple_list or single_term spelling; 'sum_all_col' counts under the normalized term. If two simple_list
+                spellings normalize alike, only the first receives counts and a warning is raised. Default is False.
+            - preview= Boolean. If True, summarizes a reservoir sample and scales counts up with preview_summarizer().
+                See it for the preview_size, preview_strata, preview_seed and confidence options.
     - Return: Depending on option, a sample as a List of Tuples or Dict of grouped samples
 '''
 def summarizer(**kwargs):
-    cleaned_df_data = pd.DataFrame([])
-    clean_data_filtered = pd.DataFrame([])
-    
-    # 1. Remove null values
-    clean_data = kwargs['df_corpus'][(kwargs['df_corpus'][kwargs['primary_col']].isnull() == False)]
-    
-    # 2. Is it URLs or Hashtags
+    # Preview mode summarizes a reservoir sample instead of the whole corpus
+    if kwargs.get('preview', False) == True:
+        return preview_summarizer(**kwargs)
+
+    # 1. Remove null values and 2. keep URLs or Hashtags, as one mask of row positions.
+    # Columns are then read through these positions as needed, without copying the corpus.
     print('Cleaning the data.')
-    if kwargs['column_type'] == 'hashtags':
-        clean_data_filtered = clean_data[clean_data[kwargs['primary_col']].str.contains('#')]
-    
-    elif kwargs['column_type'] == 'urls':
-        clean_data_filtered = clean_data[clean_data[kwargs['primary_col']].str.contains('http')]
-    
-    elif kwargs['column_type'] == 'other':
-        clean_data_filtered = clean_data.copy()
-        
-    cleaned_df_data = clean_data_filtered.reset_index()
+    clean_rows = clean_row_index(kwargs['df_corpus'], kwargs['primary_col'], kwargs['column_type'])
     print('Data cleaned, now writing samples.')
+
+    # Normalize each distinct term once; search terms compile to hashed term IDs.
+    # URLs can count as raw strings, canonical URLs or domains.
+    normalize_options = kwargs.get('normalize_terms', False)
+    if normalize_options == True:
+        normalize_options = {}
+    elif normalize_options == False or normalize_options is None:
+        normalize_options = {'casefold': False, 'nfkc': False}
+    preprocess = None
+    if kwargs['column_type'] == 'urls':
+        preprocess = url_normalizer(kwargs.get('url_option'))
+    terms = termNormalizer(preprocess=preprocess, **normalize_options)
+    simple_query = terms.compile(kwargs['simple_list']) if kwargs.get('simple_list') is not None else {}
+    single_query = terms.compile([kwargs['single_term']]) if kwargs.get('single_term') is not None else {}
     
-    # 2. Count and sort; append to this list
-    cleaned_listed_data = []
+    # 2. Count and sort; tally into this Counter
+    col_totals = Counter()
     
     # Option 2.1 - Count per Hashtag, across entire corpus
     if kwargs['main_sum_option'] == 'sum_all_col':
-        print('Hydrating by desired', kwargs['sum_option'])
-        for h in list(cleaned_df_data[kwargs['primary_col']]):
-            h = ast.literal_eval(h)
+        print('Hydrating by desired', kwargs['main_sum_option'])
+        for row in iter_rows(kwargs['df_corpus'], [kwargs['primary_col']], clean_rows):
+            h = ast.literal_eval(row[0])
             if type(h) is not float:
-                h = [n.strip() for n in h]
+                h = [terms.label(n) for n in h]
                 if len(h) > 1 and type(h) is not float:
                     for i in h:
-                        cleaned_listed_data.append(i)
+                        col_totals[i] += 1
                 elif len(h) == 1 and type(h) is not float:
-                    cleaned_listed_data.append(h[0]) 
-        
-        # Count'em up
-        col_totals = list(Counter(cleaned_listed_data).items())
+                    col_totals[h[0]] += 1
         
+        col_totals = list(col_totals.items())
+
         print('Writing up the sample')
         top_x = get_sample_size(
             sort_check=kwargs['sort_check'],
@@ -440,21 +705,20 @@ def summarizer(**kwargs):
         return top_x
     # Option 2.2 - Count group of hashtags across entire corpus
     elif kwargs['main_sum_option'] == 'sum_group_col':
-        print('Hydrating by desired', kwargs['sum_option'])
-        for h in list(cleaned_df_data[kwargs['primary_col']]):
-            h = ast.literal_eval(h)
+        print('Hydrating by desired', kwargs['main_sum_option'])
+        for row in iter_rows(kwargs['df_corpus'], [kwargs['primary_col']], clean_rows):
+            h = ast.literal_eval(row[0])
             if type(h) is not float:
-                h = [n.strip() for n in h]
+                h = [terms.match(n, simple_query) for n in h]
                 if len(h) > 1 and type(h) is not float:
                     for i in h:
-                        if i in kwargs['simple_list']:
-                            cleaned_listed_data.append(i)
-                elif len(h) == 1 and type(h) is not float and h[0] in kwargs['simple_list']:
-                    cleaned_listed_data.append(h[0]) 
-        
-        # Count'em up
-        col_totals = list(Counter(cleaned_listed_data).items())
+                        if i is not None:
+                            col_totals[i] += 1
+                elif len(h) == 1 and type(h) is not float and h[0] is not None:
+                    col_totals[h[0]] += 1
         
+        col_totals = list(col_totals.items())
+
         print('Writing up the sample')
         top_x = get_sample_size(
             sort_check=kwargs['sort_check'],
@@ -467,20 +731,20 @@ def summarizer(**kwargs):
         return top_x
     # Option 2.3 - Count single hashtag across entire corpus
     elif kwargs['main_sum_option'] == 'sum_single_col':
-        print('Hydrating by desired', kwargs['sum_option'])
-        for h in list(cleaned_df_data[kwargs['primary_col']]):
-            h = ast.literal_eval(h)
+        print('Hydrating by desired', kwargs['main_sum_option'])
+        for row in iter_rows(kwargs['df_corpus'], [kwargs['primary_col']], clean_rows):
+            h = ast.literal_eval(row[0])
             if type(h) is not float:
-                h = [n.strip() for n in h]
+                h = [terms.match(n, single_query) for n in h]
                 if len(h) > 1 and type(h) is not float:
                     for i in h:
-                        if i == kwargs['single_term']:
-                            cleaned_listed_data.append(i)
-                elif len(h) == 1 and type(h) is not float and h[0] == kwargs['single_term']:
-                    cleaned_listed_data.append(h[0]) 
-        
-        col_totals = list(Counter(cleaned_listed_data).items())
+                        if i is not None:
+                            col_totals[i] += 1
+                elif len(h) == 1 and type(h) is not float and h[0] is not None:
+                    col_totals[h[0]] += 1
         
+        col_totals = list(col_totals.items())
+
         print('Writing up the sample')
         top_x = get_sample_size(
             sort_check=kwargs['sort_check'],
@@ -493,24 +757,22 @@ def summarizer(**kwargs):
         return top_x
     # Option 2.4 - Count a single isolated value temporally across entire corpus
     elif kwargs['main_sum_option'] == 'single_term_perday':
-        # Isolate columns of interest: Dates (xx-xx-xxxx) and 
-        df_primary_data = cleaned_df_data[[kwargs['date_col'], kwargs['primary_col'], [kwargs['id']]]]
-        col_and_dates = []
-        for h in df_primary_data.values.tolist():
+        # Isolate columns of interest: Dates (xx-xx-xxxx) and primary column
+        for h in iter_rows(kwargs['df_corpus'], [kwargs['date_col'], kwargs['primary_col']], clean_rows):
             ht = ast.literal_eval(h[1])
             if type(ht) is not float:
-                ht = [n.strip() for n in ht]
+                ht = [terms.match(n, single_query) for n in ht]
                 if len(ht) > 1:
                     for i in ht:
                         # Check if equal to search parameter
-                        if i == kwargs['single_term']:
+                        if i is not None:
                             # Append hashtag and date
-                            col_and_dates.append( (i, h[0]) )
-                elif len(ht) == 1 and ht[0] == kwargs['single_term']:
+                            col_totals[(i, h[0])] += 1
+                elif len(ht) == 1 and ht[0] is not None:
                     # Append hashtag and date
-                    col_and_dates.append( (ht[0], h[0]) )
-        
-        col_totals = list(Counter(col_and_dates).items())
+                    col_totals[(ht[0], h[0])] += 1
+
+        col_totals = list(col_totals.items())
 
         print('Writing up the sample')
         top_date_x = get_sample_size(
@@ -533,46 +795,42 @@ def summarizer(**kwargs):
     # Option 2.5 - Count grouping of variable values per Day across entire corpus
     elif kwargs['main_sum_option'] == 'grouped_terms_perday':
         print('Hydrating by desired', kwargs['main_sum_option'])
-        col_and_dates = []
         terms_date_totals = []
-        merged_terms_and_dates = []
         # Write Lists with desired search parameters info
         if kwargs['group_search_option'] == 'single_col':
             # If column has embedded listed values ONLY
-            df_primary_data = cleaned_df_data[[kwargs['date_col'], kwargs['primary_col']]]
-            for h in df_primary_data.values.tolist():
+            for h in iter_rows(kwargs['df_corpus'], [kwargs['date_col'], kwargs['primary_col']], clean_rows):
                 # Code as a list
                 ht = ast.literal_eval(h[1])
                 if type(ht) is not float:
-                    ht = [n.strip() for n in ht]
+                    ht = [terms.match(n, simple_query) for n in ht]
                     if len(ht) > 1:
                         for i in ht:
                             # Check if in simple_list
-                            if i in kwargs['simple_list']:
+                            if i is not None:
                                 # Append term and date
-                                col_and_dates.append( (i, h[0]) )
+                                col_totals[(i, h[0])] += 1
                     elif len(ht) == 1:
-                        if ht[0] in kwargs['simple_list']:
+                        if ht[0] is not None:
                             # Append term and date
-                            col_and_dates.append( (ht[0], h[0]) )
-                            
-            terms_date_totals = list(Counter(col_and_dates).items())
+                            col_totals[(ht[0], h[0])] += 1
+
+            terms_date_totals = list(col_totals.items())
             
         elif kwargs['group_search_option'] == 'keywords_and_col':
             # 1. Search and list primary column xref'd with the simple_list
-            df_data = cleaned_df_data[[kwargs['date_col'], kwargs['primary_col'], kwargs['id_col']]]
-            primary_dates_id = accumulator('simple', df_data.values.tolist(), kwargs['simple_list'])
+            df_data = iter_rows(kwargs['df_corpus'], [kwargs['date_col'], kwargs['primary_col'], kwargs['id_col']], clean_rows)
+            primary_dates_id = accumulator('simple', df_data, kwargs['simple_list'], terms)
             
             # 2. Search secondary_col with keyed_list; Also filters out content already accounted by the simple_list
-            df_kw_data = kwargs['df_corpus'][ [kwargs['date_col'], kwargs['primary_col'], kwargs['secondary_col'], kwargs['id_col'] ]]
-            secondary_dates_id = accumulator('keyed', df_kw_data.values.tolist(), kwargs['keyed_list'])
+            df_kw_data = iter_rows(kwargs['df_corpus'], [kwargs['date_col'], kwargs['primary_col'], kwargs['secondary_col'], kwargs['id_col']])
+            secondary_dates_id = accumulator('keyed', df_kw_data, kwargs['keyed_list'])
             
             # 3. Merge Lists and filter out unecessary items
-            merged_list = primary_dates_id + secondary_dates_id
-            for m in merged_list:
-                merged_terms_and_dates.append((m[0], m[1]))
+            for m in primary_dates_id + secondary_dates_id:
+                col_totals[(m[0], m[1])] += 1
         
-            terms_date_totals = list(Counter(merged_terms_and_dates).items())
+            terms_date_totals = list(col_totals.items())
         
         print('Writing up the sample')
         top_date_x = get_sample_size(
@@ -600,7 +858,12 @@ def summarizer(**kwargs):
                 group_type=kwargs['time_agg_type'],
                 skeleton=kwargs['skeleton']
             )
-                    
+
+        # Hand the hydrated Dict straight to exporters, skipping the DataFrame
+        if kwargs['grouped_output_type'] == 'dict':
+            print('\n\nSample hydration complete!')
+            return grouped_top_date_x
+
         print('\n\nConverting data to a DataFrame.')
         
         df_grouped_top_date_x = grouped_dict_to_df(
@@ -615,6 +878,797 @@ def summarizer(**kwargs):
 
 ##################################################################
 
+## PREVIEW FUNCTIONS
+
+##################################################################
+
+'''
+    smallest_keys: Helper function for reservoir_sampler(). Finds the positions of the n smallest keys,
+        overall or within each stratum.
+    - Args:
+        - keys= numpy array of random keys.
+        - n= Integer, or Dict of Integers per stratum, of keys to keep.
+        - strata= Optional numpy array of each key's stratum.
+    - Returns numpy array of positions.
+'''
+def smallest_keys(keys, n, strata=None):
+    if strata is None:
+        if len(keys) <= n:
+            return np.arange(len(keys))
+        return np.argpartition(keys, n)[:n]
+    # Sort by stratum, then key; keys are in [0, 1), so each stratum stays contiguous
+    codes, uniques = pd.factorize(strata)
+    codes[codes == -1] = len(uniques) # Null strata
+    order = np.argsort(codes + keys)
+    sorted_codes = codes[order]
+    counts = np.bincount(codes, minlength=len(uniques) + 1)
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    rank = np.arange(len(order)) - starts[sorted_codes]
+    if isinstance(n, dict):
+        limit = np.array([n.get(u, 0) for u in uniques] + [0])[sorted_codes]
+    else:
+        limit = n
+    return order[rank < limit]
+
+'''
+    stratum_allocation: Helper function for reservoir_sampler(). Allocates a sample to each stratum
+        in proportion to its size, at least 1 each.
+    - Args:
+        - strata_totals= Dict of tweets per stratum.
+        - total= Integer of tweets across the strata.
+        - sample_size= Integer of tweets to sample.
+        - slack= Integer. Multiplies each share, then rounds up, to bound candidates while more chunks arrive.
+            Default is 0, which rounds each share for the final sample.
+    - Returns Dict of tweets to keep per stratum.
+'''
+def stratum_allocation(strata_totals, total, sample_size, slack=0):
+    allocation = {}
+    for stratum in strata_totals:
+        share = sample_size * strata_totals[stratum] / total
+        share = int(math.ceil(share * slack)) if slack > 0 else int(round(share))
+        allocation[stratum] = min(strata_totals[stratum], max(1, share))
+    return allocation
+
+'''
+    reservoir_sampler: Draws a uniform or stratified reservoir sample of tweets in one pass. Each tweet
+        gets a random key and the sample keeps the smallest keys. A stratified sample allocates tweets to
+        each stratum (e.g. Day) in proportion to its size, at least 1 each, which keeps the sample self-weighting.
+        A DataFrame's strata sizes are known up front, so only each stratum's share is ever copied. Chunked input
+        keeps up to twice each stratum's running share as candidates, so at most about twice the sample is
+        held beyond the current chunk. It stays exact unless a stratum's final share is over twice its share
+        at an earlier chunk.
+    - Args:
+        - df_corpus= DataFrame of tweet corpus, or an iterable of DataFrame chunks,
+            e.g. pd.read_csv('tweets.csv', chunksize=1000000).
+        - sample_size= Integer of tweets to sample.
+        - strata_col= Optional String. Name of the DataFrame column to stratify by, e.g. the date column.
+        - seed= Optional Integer for a repeatable sample.
+    - Returns Tuple of the sample DataFrame and the Integer of tweets in the corpus.
+'''
+def reservoir_sampler(df_corpus, sample_size, strata_col=None, seed=None):
+    rng = np.random.default_rng(seed)
+    single = isinstance(df_corpus, pd.DataFrame)
+    chunks = [df_corpus] if single else df_corpus
+    reservoir = None
+    reservoir_keys = np.empty(0)
+    strata_totals = Counter()
+    total = 0
+
+    for chunk in chunks:
+        total += len(chunk)
+        keys = rng.random(len(chunk))
+        strata = None
+        limit = sample_size
+        if strata_col is not None:
+            # One hashing pass over the strata gives both their codes and their totals
+            strata, uniques = pd.factorize(chunk[strata_col])
+            strata_totals.update(dict(zip(uniques, np.bincount(strata[strata >= 0], minlength=len(uniques)))))
+            # Cap each stratum's candidates at its running share of the sample
+            caps = stratum_allocation(strata_totals, total, sample_size, slack=0 if single else 2)
+            limit = {code: caps[u] for code, u in enumerate(uniques)}
+        # Keep the chunk's candidates, then merge them into the reservoir
+        keep = smallest_keys(keys, limit, strata)
+        candidates = chunk.iloc[keep]
+        if reservoir is None:
+            reservoir, reservoir_keys = candidates, keys[keep]
+        else:
+            reservoir = pd.concat([reservoir, candidates])
+            reservoir_keys = np.concatenate([reservoir_keys, keys[keep]])
+            strata = None if strata_col is None else reservoir[strata_col].values
+            keep = smallest_keys(reservoir_keys, sample_size if strata_col is None else caps, strata)
+            reservoir, reservoir_keys = reservoir.iloc[keep], reservoir_keys[keep]
+
+    if reservoir is None:
+        return pd.DataFrame([]), 0
+
+    # Allocate the stratified sample in proportion to each stratum's tweets
+    if strata_col is not None and not single:
+        allocation = stratum_allocation(strata_totals, total, sample_size)
+        keep = smallest_keys(reservoir_keys, allocation, reservoir[strata_col].values)
+        reservoir = reservoir.iloc[keep]
+
+    return reservoir, total
+
+'''
+    count_interval: Helper function for preview_summarizer(). Scales a sample count up to the corpus,
+        with a normal-approximation confidence interval for a count drawn from a sample without replacement.
+    - Args:
+        - count= Integer count in the sample.
+        - n= Integer of tweets in the sample.
+        - total= Integer of tweets in the corpus.
+        - z= Float. Standard normal quantile for the confidence level.
+    - Returns Tuple of the Integer estimate and a Tuple of its Integer (low, high) bounds.
+'''
+def count_interval(count, n, total, z):
+    p = min(count / n, 1.0)
+    estimate = total * p
+    se = total * math.sqrt(p * (1 - p) / n * (1 - n / total))
+    return int(round(estimate)), (int(max(0, math.floor(estimate - z * se))), int(math.ceil(estimate + z * se)))
+
+'''
+    scale_counts: Helper function for preview_summarizer(). Scales every count in a hydrated skeleton Dict in place.
+    - Args:
+        - group_dict= Hydrated skeleton Dict, at any aggregate level.
+        - scale= Float to multiply each count by.
+'''
+def scale_counts(group_dict, scale):
+    for k in group_dict:
+        if isinstance(group_dict[k], dict):
+            scale_counts(group_dict[k], scale)
+        else:
+            group_dict[k] = int(round(group_dict[k] * scale))
+
+'''
+    interval_counts: Helper function for preview_summarizer(). Writes the confidence interval of every sample count
+        in a hydrated skeleton Dict, scaled up to the corpus by count_interval().
+    - Args:
+        - group_dict= Hydrated skeleton Dict of sample counts, at any aggregate level.
+        - n= Integer of tweets in the sample.
+        - total= Integer of tweets in the corpus.
+        - z= Float. Standard normal quantile for the confidence level.
+    - Returns Dict in the shape of group_dict with a Tuple of Integer (low, high) bounds per count.
+'''
+def interval_counts(group_dict, n, total, z):
+    intervals = {}
+    for k in group_dict:
+        if isinstance(group_dict[k], dict):
+            intervals[k] = interval_counts(group_dict[k], n, total, z)
+        else:
+            intervals[k] = count_interval(group_dict[k], n, total, z)[1]
+    return intervals
+
+'''
+    preview_summarizer: Runs summarizer() on a reservoir sample of the corpus and scales the counts back up,
+        for a fast first look at large corpora. Called by summarizer() when preview=True.
+    - Args:
+        - Every summarizer() option, where df_corpus may also be an iterable of DataFrame chunks.
+        - preview_size= Integer of tweets to sample. Default is 100000.
+        - preview_strata= Optional String. Name of the DataFrame column to stratify by, e.g. the date column.
+        - preview_seed= Optional Integer for a repeatable sample.
+        - confidence= Float (0-1). Confidence level of the intervals. Default is 0.95.
+    - Return: Depending on main_sum_option, like summarizer():
+        - 'sum_all_col', 'sum_group_col', 'sum_single_col': List of Tuples with estimated counts and intervals,
+            ```[('#maquin', 120400, (118230, 122570)), ...]```
+        - 'single_term_perday', or 'grouped_terms_perday' with grouped_output_type='dict': Tuple of the Dict of
+            grouped samples with estimated counts and a companion Dict of the same shape with (low, high) intervals,
+            ```({'1': {'#maquin': 80400, ...}, ...}, {'1': {'#maquin': (78100, 82700), ...}, ...})```
+        - 'grouped_terms_perday': DataFrame with estimated counts, plus a '<column>_low' and '<column>_high'
+            interval column per count column, e.g. '#maquin_low' and '#maquin_high', or 'count_low' and 'count_high'
+'''
+def preview_summarizer(**kwargs):
+    preview_size = kwargs.get('preview_size', 100000)
+    print('Sampling', preview_size, 'tweets for a preview.')
+    df_sample, total = reservoir_sampler(
+        kwargs['df_corpus'],
+        preview_size,
+        strata_col=kwargs.get('preview_strata'),
+        seed=kwargs.get('preview_seed')
+    )
+    n = len(df_sample)
+    print('Previewing', n, 'of', total, 'tweets.')
+    summary = summarizer(**dict(kwargs, df_corpus=df_sample, preview=False))
+    if n == 0:
+        return summary
+
+    scale = total / n
+    z = NormalDist().inv_cdf(0.5 + kwargs.get('confidence', 0.95) / 2)
+    if isinstance(summary, list):
+        return [(c[0],) + count_interval(c[1], n, total, z) for c in summary]
+    elif isinstance(summary, pd.DataFrame):
+        count_cols = [c for c in summary.columns if c not in ['period', 'term']]
+        bounds = {}
+        for c in count_cols:
+            intervals = [count_interval(v, n, total, z)[1] for v in summary[c].values]
+            bounds[str(c) + '_low'] = [i[0] for i in intervals]
+            bounds[str(c) + '_high'] = [i[1] for i in intervals]
+        summary[count_cols] = (summary[count_cols] * scale).round().astype(int)
+        # Interval columns go last, so plotters still find the count columns first
+        return pd.concat([summary, pd.DataFrame(bounds, index=summary.index)], axis=1)
+    elif isinstance(summary, dict):
+        intervals = interval_counts(summary, n, total, z)
+        scale_counts(summary, scale)
+        return summary, intervals
+    return summary
+
+##################################################################
+
+## TOPPER FUNCTIONS
+
+##################################################################
+
+'''
+    listed_terms: Helper function for build_topper(). Parses a column value into a List of stripped terms.
+        Listed values, e.g. "['#maquin', '#noborderwall']", are parsed; single values return a List of one.
+        Values that only look listed, e.g. tweet text like "[THREAD] ...", are kept whole.
+    - Args:
+        - value= String, List, or null value from a DataFrame column.
+        - listed= Boolean. If False, String values are never parsed as Lists. Default is True.
+    - Returns List of terms, which is empty for null values.
+'''
+def listed_terms(value, listed=True):
+    if value is None or type(value) is float:
+        return []
+    if isinstance(value, str):
+        if not listed or not value.startswith('['):
+            value = [value]
+        else:
+            try:
+                parsed = ast.literal_eval(value)
+            except (ValueError, SyntaxError):
+                parsed = None
+            value = parsed if isinstance(parsed, (list, tuple)) else [value]
+    return [n.strip() for n in value if isinstance(n, str) and len(n.strip()) > 0]
+
+'''
+    build_topper: Fills every requested top X field of a topperObject, across the corpus and per period,
+        in a single scan of the corpus. Each field and period tallies into a topCounter of fixed capacity,
+        so memory stays flat regardless of vocabulary size. Tallies are exact while a field has fewer distinct
+        terms than the capacity; past that, a tally may overcount by at most its error, the smallest tally it
+        replaced, and build_topper() warns that the counter evicted terms.
+    - Args:
+        - topperObject= Optional first argument topperObject. If its period_dates are set, they are used.
+        - df_corpus= DataFrame of tweet corpus
+        - fields= Dict of topperObject fields to DataFrame column names:
+            {'hashtags': 'hashtags', 'urls': 'urls', 'tweeters': 'username', 'tweets': 'tweet', 'rts': 'retweet_of', 'topics': 'topic'}
+        - listed_fields= Optional List of the fields whose columns are listed and parsed per term.
+            Other fields, like tweets and tweeters, are tallied as whole values. Default is ['hashtags', 'urls'].
+        - top_x= Integer of top values to keep per field and period.
+        - capacity= Optional Integer of tallies to track per field and period. Default is 10 times top_x.
+        - date_col= String value of the DataFrame column name for the dates in YYYY-MM-DD format.
+        - period_dates= Optional Dict of Lists per period from period_dates_writer().
+        - guaranteed_only= Boolean. If True, keeps only the entries certain to be in the top X, i.e.,
+            whose count minus error is at least the next tally. Default is False.
+    - Returns topperObject with each requested .top_x_<field> as a Dict of (term, count, error) Tuples:
+        {'corpus': [('#maquin', 120, 0), ...], 'periods': {'1': [('#maquin', 80, 0), ...], ...}}
+'''
+def build_topper(topperObject=None, **kwargs):
+    if topperObject == None:
+        topperObject = initializeTO()
+    period_dates = kwargs.get('period_dates', topperObject.period_dates)
+    if period_dates == None:
+        period_dates = {}
+    capacity = kwargs.get('capacity', kwargs['top_x'] * 10)
+
+    # Look up each date's period once instead of per tweet
+    date_periods = {}
+    for p in period_dates:
+        for d in period_dates[p]:
+            date_periods[d] = p
+
+    fields = list(kwargs['fields'])
+    listed_fields = kwargs.get('listed_fields', ['hashtags', 'urls'])
+    listed = [f in listed_fields for f in fields]
+    counters = {}
+    for f in fields:
+        counters[f] = {
+            'corpus': topCounter(capacity),
+            'periods': {p: topCounter(capacity) for p in period_dates}
+        }
+
+    # One pass over the corpus for every field
+    print('Building top', kwargs['top_x'], 'for', ', '.join(fields))
+    df = kwargs['df_corpus']
+    columns = [df[kwargs['date_col']].values] + [df[kwargs['fields'][f]].values for f in fields]
+    for row in zip(*columns):
+        p = date_periods.get(row[0])
+        for f, is_listed, value in zip(fields, listed, row[1:]):
+            for term in listed_terms(value, is_listed):
+                counters[f]['corpus'].add(term)
+                if p is not None:
+                    counters[f]['periods'][p].add(term)
+
+    top = 'guaranteed' if kwargs.get('guaranteed_only', False) else 'top'
+    for f in fields:
+        evicted = [c for c in [counters[f]['corpus']] + list(counters[f]['periods'].values()) if c.evicted > 0]
+        if len(evicted) > 0:
+            warnings.warn('top_x_' + f + ' has more distinct terms than the capacity of ' + str(capacity) +
+                ', so its counts are upper bounds. Check each error, raise capacity, or pass guaranteed_only=True.')
+        setattr(topperObject, 'top_x_' + f, {
+            'corpus': getattr(counters[f]['corpus'], top)(kwargs['top_x']),
+            'periods': {p: getattr(counters[f]['periods'][p], top)(kwargs['top_x']) for p in period_dates}
+        })
+    if len(period_dates) > 0:
+        topperObject.period_dates = period_dates
+    print('Top', kwargs['top_x'], 'complete.')
+    return topperObject
+
+##################################################################
+
+## TWEETER FUNCTIONS
+
+##################################################################
+
+'''
+    explode_listed: Helper function for tweeter_stats(). Integer-encodes the terms of a listed column.
+        Each distinct listed value, e.g. "['#maquin', '#noborderwall']", is parsed only once.
+    - Args:
+        - col= Series of listed values.
+    - Returns Tuple of a numpy array of row positions and a numpy array of term codes, one entry per term use,
+        and the Index of terms for the codes.
+'''
+def explode_listed(col):
+    list_codes, list_values = pd.factorize(col)
+    parsed = [listed_terms(v) for v in list_values]
+    lengths = np.array([len(p) for p in parsed] + [0], dtype=np.int64) # Last entry for null values
+    offsets = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+    term_codes, terms = pd.factorize(pd.Series(list(itertools.chain.from_iterable(parsed)), dtype=object))
+
+    list_codes = np.where(list_codes >= 0, list_codes, len(parsed))
+    row_lengths = lengths[list_codes]
+    rows = np.repeat(np.arange(len(col)), row_lengths)
+    # Position of each term use within its row's list
+    within = np.arange(len(rows)) - np.repeat(np.cumsum(row_lengths) - row_lengths, row_lengths)
+    uses = term_codes[np.repeat(offsets[list_codes], row_lengths) + within]
+    return rows, uses, terms
+
+'''
+    distinct_per_user: Helper function for tweeter_stats(). Counts the distinct values per user code.
+    - Args:
+        - user_codes= numpy array of user codes.
+        - value_codes= numpy array of value codes, e.g. dates or hashtags.
+        - n_values= Integer of distinct value codes.
+        - n_users= Integer of distinct user codes.
+    - Returns numpy array of distinct value counts per user code.
+'''
+def distinct_per_user(user_codes, value_codes, n_values, n_users):
+    pairs = np.sort(user_codes.astype(np.int64) * n_values + value_codes)
+    first = np.ones(len(pairs), dtype=bool)
+    first[1:] = pairs[1:] != pairs[:-1]
+    return np.bincount(pairs[first] // n_values, minlength=n_users)
+
+'''
+    tweeter_stats: Computes per-tweeter volume, active days and hashtag diversity for every user at once,
+        across the corpus and per period, with vectorized groupbys over integer-encoded user and date columns.
+        Only the top_n rows per period are built, so the output stays bounded with millions of accounts.
+    - Args:
+        - df_corpus= DataFrame of tweet corpus
+        - user_col= String value of the DataFrame column name for the usernames.
+        - date_col= String value of the DataFrame column name for the dates in YYYY-MM-DD format.
+        - hashtag_col= Optional String value of the DataFrame column name for the listed hashtags.
+        - period_dates= Optional Dict of Lists per period from period_dates_writer().
+        - top_n= Optional Integer of tweeters to keep per period. Default keeps every tweeter.
+        - sort_by= String. Metric to rank tweeters by: 'tweets', 'active_days', 'hashtags' or 'distinct_hashtags'.
+            Default is 'tweets'.
+    - Returns DataFrame with period ('corpus' for the whole corpus), tweeter, tweets, active_days, hashtags,
+        distinct_hashtags and hashtag_diversity (distinct_hashtags / hashtags) columns, ranked per period.
+'''
+def tweeter_stats(**kwargs):
+    df = kwargs['df_corpus']
+    sort_by = kwargs.get('sort_by', 'tweets')
+    top_n = kwargs.get('top_n')
+    print('Computing tweeter stats.')
+
+    # 1. Integer-encode users and dates
+    user_codes, users = pd.factorize(df[kwargs['user_col']])
+    date_codes, dates = pd.factorize(df[kwargs['date_col']])
+    valid = (user_codes >= 0) & (date_codes >= 0)
+    n_users = len(users)
+
+    # 2. Encode each date's period: 0 is the whole corpus, then one code per period
+    groups = ['corpus']
+    date_groups = np.zeros(len(dates) + 1, dtype=np.int64) # Last entry for null dates
+    if kwargs.get('period_dates') is not None:
+        date_periods = {}
+        for p in kwargs['period_dates']:
+            groups.append(p)
+            for d in kwargs['period_dates'][p]:
+                date_periods[d] = len(groups) - 1
+        date_groups[:-1] = [date_periods.get(d, -1) for d in dates]
+    row_groups = date_groups[date_codes]
+
+    # 3. Integer-encode each hashtag use
+    if kwargs.get('hashtag_col') is not None:
+        tag_rows, tag_codes, tags = explode_listed(df[kwargs['hashtag_col']])
+        tag_rows, tag_codes = tag_rows[valid[tag_rows]], tag_codes[valid[tag_rows]]
+
+    stats = []
+    for g, label in enumerate(groups):
+        # The corpus group keeps every valid row
+        in_group = valid if g == 0 else valid & (row_groups == g)
+        g_users = user_codes[in_group]
+        metrics = {
+            'tweets': np.bincount(g_users, minlength=n_users),
+            'active_days': distinct_per_user(g_users, date_codes[in_group], max(len(dates), 1), n_users),
+            'hashtags': np.zeros(n_users, dtype=np.int64),
+            'distinct_hashtags': np.zeros(n_users, dtype=np.int64)
+        }
+        if kwargs.get('hashtag_col') is not None:
+            tag_in_group = slice(None) if g == 0 else row_groups[tag_rows] == g
+            tag_users = user_codes[tag_rows[tag_in_group]]
+            metrics['hashtags'] = np.bincount(tag_users, minlength=n_users)
+            metrics['distinct_hashtags'] = distinct_per_user(tag_users, tag_codes[tag_in_group], max(len(tags), 1), n_users)
+
+        # 4. Keep only the top_n tweeters
+        active = np.flatnonzero(metrics['tweets'] > 0)
+        if top_n is not None and len(active) > top_n:
+            active = active[np.argpartition(-metrics[sort_by][active], top_n - 1)[:top_n]]
+        active = active[np.argsort(-metrics[sort_by][active], kind='stable')]
+
+        df_group = pd.DataFrame({
+            'period': label,
+            'tweeter': users[active],
+            'tweets': metrics['tweets'][active],
+            'active_days': metrics['active_days'][active],
+            'hashtags': metrics['hashtags'][active],
+            'distinct_hashtags': metrics['distinct_hashtags'][active]
+        })
+        df_group['hashtag_diversity'] = np.where(
+            df_group['hashtags'] > 0,
+            df_group['distinct_hashtags'] / np.maximum(df_group['hashtags'], 1),
+            0.0
+        )
+        stats.append(df_group)
+
+    print('Tweeter stats complete.')
+    return pd.concat(stats, ignore_index=True)
+
+##################################################################
+
+## BURST FUNCTIONS
+
+##################################################################
+
+'''
+    term_day_matrix: Counts every term per Day into a day x term DataFrame for burst_detector().
+        Builds from the whole corpus vocabulary, or from a hydrated 'day' skeleton Dict.
+    - Args:
+        - df_corpus= DataFrame of tweet corpus. Not needed if group_dict is passed.
+        - primary_col= String. Name of the listed DataFrame column to count, e.g., hashtags, urls, etc.
+        - date_col= String value of the DataFrame column name for the dates in YYYY-MM-DD format.
+        - group_dict= Optional hydrated 'day' skeleton Dict, ```{'2018-01-01': {'#maquin': 3, ...}, ...}```
+        - date_range= Optional List of per Day dates. Missing days are filled with 0 counts.
+            Default is every Day from the first to the last date, so days without any term uses stay in the windows.
+        - min_total= Optional Integer. Drops terms with fewer total counts, before the dense matrix is built
+            from the corpus. Default is 1.
+    - Returns DataFrame with one row per consecutive Day (sorted) and one column per term.
+'''
+def term_day_matrix(**kwargs):
+    if kwargs.get('group_dict') is not None:
+        matrix = pd.DataFrame.from_dict(kwargs['group_dict'], orient='index').fillna(0).astype(int)
+    else:
+        print('Counting terms per day.')
+        df = kwargs['df_corpus']
+        rows, uses, terms = explode_listed(df[kwargs['primary_col']])
+        date_codes, dates = pd.factorize(df[kwargs['date_col']])
+        # Drop rare terms before the dense day x term counts are built
+        kept = np.flatnonzero(np.bincount(uses, minlength=len(terms)) >= kwargs.get('min_total', 1))
+        kept = kept[np.argsort(terms[kept].values)]
+        columns = np.full(len(terms), -1)
+        columns[kept] = np.arange(len(kept))
+        uses_days = date_codes[rows]
+        valid = (columns[uses] >= 0) & (uses_days >= 0)
+        counts = np.bincount(uses_days[valid] * len(kept) + columns[uses[valid]], minlength=len(dates) * len(kept))
+        matrix = pd.DataFrame(counts.reshape(len(dates), len(kept)), index=dates, columns=terms[kept])
+
+    date_range = kwargs.get('date_range')
+    if date_range is None and len(matrix) > 0:
+        days = pd.to_datetime(matrix.index)
+        date_range = pd.date_range(days.min(), days.max()).strftime('%Y-%m-%d')
+    if date_range is not None:
+        matrix = matrix.reindex(date_range, fill_value=0)
+    matrix = matrix.sort_index()
+    matrix = matrix.loc[:, matrix.sum() >= kwargs.get('min_total', 1)]
+    print('Term matrix has', matrix.shape[0], 'days and', matrix.shape[1], 'terms.')
+    return matrix
+
+'''
+    kleinberg_states: Helper function for burst_detector(). Fits a 2-state Kleinberg burst model to every term
+        at once, with a Viterbi pass over the days that is vectorized across the terms.
+    - Args:
+        - counts= numpy array of day x term counts.
+        - totals= numpy array of counts per day that the term counts are drawn from.
+        - s= Float. Ratio of the burst rate to a term's base rate.
+        - gamma= Float. Cost of entering the burst state, scaled by log(days).
+    - Returns Tuple of a boolean day x term array of burst states and a day x term array of
+        the cost saved by the burst state each day.
+'''
+def kleinberg_states(counts, totals, s, gamma):
+    days = counts.shape[0]
+    totals = np.maximum(totals, counts.sum(axis=1))[:, None]
+    p0 = np.clip(counts.sum(axis=0) / max(totals.sum(), 1), 1e-12, 0.9999)
+    p1 = np.clip(s * p0, 1e-12, 0.9999)
+
+    # Negative log-likelihood per state; the binomial coefficient cancels between states
+    cost0 = -(counts * np.log(p0) + (totals - counts) * np.log(1 - p0))
+    cost1 = -(counts * np.log(p1) + (totals - counts) * np.log(1 - p1))
+    up = gamma * np.log(max(days, 2))
+
+    c0 = cost0[0].copy()
+    c1 = cost1[0] + up
+    from1_to0 = np.zeros(counts.shape, dtype=bool)
+    from1_to1 = np.zeros(counts.shape, dtype=bool)
+    for t in range(1, days):
+        from1_to0[t] = c1 < c0
+        from1_to1[t] = c1 <= c0 + up
+        c0, c1 = np.minimum(c0, c1) + cost0[t], np.minimum(c0 + up, c1) + cost1[t]
+
+    # Trace back the cheapest state sequence per term
+    states = np.zeros(counts.shape, dtype=bool)
+    current = c1 < c0
+    for t in range(days - 1, -1, -1):
+        states[t] = current
+        current = np.where(current, from1_to1[t], from1_to0[t])
+    return states, cost0 - cost1
+
+'''
+    burst_windows: Helper function for burst_detector(). Turns day x term burst flags into ranked windows,
+        vectorized across terms.
+    - Args:
+        - matrix= DataFrame from term_day_matrix().
+        - flags= Boolean numpy array of day x term burst flags.
+        - weights= numpy array of day x term burst scores, summed over each window.
+    - Returns DataFrame of windows with term, start, end, days, total, peak and score columns.
+'''
+def burst_windows(matrix, flags, weights):
+    counts = matrix.values
+    days = counts.shape[0]
+    padded = np.zeros((days + 2, counts.shape[1]), dtype=np.int8)
+    padded[1:-1] = flags
+    edges = np.diff(padded, axis=0).T # term x day, so windows come out ordered per term
+    term_idx, starts = np.nonzero(edges == 1)
+    _, ends = np.nonzero(edges == -1) # exclusive ends
+
+    columns = ['term', 'start', 'end', 'days', 'total', 'peak', 'score']
+    if len(starts) == 0:
+        return pd.DataFrame([], columns=columns)
+
+    # Window sums from cumulative sums per term
+    scores = np.vstack([np.zeros(counts.shape[1]), np.cumsum(np.where(flags, weights, 0), axis=0)])
+    totals = np.vstack([np.zeros(counts.shape[1]), np.cumsum(counts, axis=0)])
+    # Window peaks from reduceat over term-major counts
+    flat = np.append(counts.T.ravel(), 0)
+    bounds = np.empty(len(starts) * 2, dtype=np.int64)
+    bounds[0::2] = term_idx * days + starts
+    bounds[1::2] = term_idx * days + ends
+    peaks = np.maximum.reduceat(flat, bounds)[0::2]
+
+    dates = matrix.index.values
+    df_windows = pd.DataFrame({
+        'term': matrix.columns.values[term_idx],
+        'start': dates[starts],
+        'end': dates[ends - 1],
+        'days': ends - starts,
+        'total': (totals[ends, term_idx] - totals[starts, term_idx]).astype(int),
+        'peak': peaks,
+        'score': scores[ends, term_idx] - scores[starts, term_idx]
+    }, columns=columns)
+    return df_windows
+
+'''
+    burst_detector: Finds bursts for every term in a day x term matrix at once and ranks their windows.
+    - Args:
+        - term_matrix= DataFrame from term_day_matrix().
+        - method= String. Current options include:
+            - 'zscore': Day count against the rolling mean and standard deviation of the prior window days
+            - 'ewma': Day count against the exponentially weighted mean and standard deviation up to the prior day
+            - 'kleinberg': 2-state Kleinberg burst model of each term's share of the daily totals
+            - Any other method raises a ValueError.
+        - window= Integer. Rolling window in days for 'zscore'. Default is 7.
+        - span= Integer. EWMA span in days for 'ewma'. Default is 7.
+        - threshold= Float. Deviations above this flag a burst day for 'zscore' and 'ewma'. Default is 3.0.
+            Standard deviations are floored at 1 count, so dormant terms need a real jump to flag.
+        - min_count= Integer. Days with fewer counts are not flagged for 'zscore' and 'ewma'. Default is 1.
+        - s= Float. Burst rate as a multiple of the base rate for 'kleinberg'. Default is 2.0.
+        - gamma= Float. Cost of entering a burst for 'kleinberg'. Default is 1.0.
+        - day_totals= Optional List, Series or Dict of tweets per Day for 'kleinberg'. Default is the matrix row sums.
+        - per_term= Optional Integer. Keeps only each term's top windows.
+        - top_n= Optional Integer. Keeps only the top windows overall.
+    - Returns DataFrame of burst windows ranked by score: term, start, end, days, total, peak and score,
+        where score sums the deviations ('zscore', 'ewma') or cost saved ('kleinberg') over the window.
+'''
+def burst_detector(**kwargs):
+    matrix = kwargs['term_matrix']
+    counts = matrix.values.astype(float)
+    method = kwargs.get('method', 'zscore')
+    if method not in ['zscore', 'ewma', 'kleinberg']:
+        raise ValueError("Unknown burst method: " + str(method) + ". Options are 'zscore', 'ewma' or 'kleinberg'.")
+    print('Detecting bursts for', matrix.shape[1], 'terms with', method)
+
+    if method == 'zscore':
+        window = kwargs.get('window', 7)
+        rolling = matrix.rolling(window, min_periods=window)
+        mean = rolling.mean().shift(1).values
+        std = np.maximum(rolling.std().shift(1).values, 1.0)
+        weights = (counts - mean) / std
+    elif method == 'ewma':
+        ewm = matrix.ewm(span=kwargs.get('span', 7), adjust=False)
+        mean = ewm.mean().shift(1).values
+        std = np.maximum(ewm.std().shift(1).values, 1.0)
+        weights = (counts - mean) / std
+
+    if method in ['zscore', 'ewma']:
+        with np.errstate(invalid='ignore'):
+            flags = (weights > kwargs.get('threshold', 3.0)) & (counts >= kwargs.get('min_count', 1))
+    elif method == 'kleinberg':
+        totals = counts.sum(axis=1)
+        if kwargs.get('day_totals') is not None:
+            day_totals = kwargs['day_totals']
+            if isinstance(day_totals, dict):
+                day_totals = pd.Series(day_totals)
+            if isinstance(day_totals, pd.Series):
+                day_totals = day_totals.reindex(matrix.index).fillna(0)
+            totals = np.asarray(day_totals, dtype=float)
+        flags, weights = kleinberg_states(counts, totals, kwargs.get('s', 2.0), kwargs.get('gamma', 1.0))
+
+    df_bursts = burst_windows(matrix, flags, weights)
+    df_bursts = df_bursts.sort_values('score', ascending=False, kind='mergesort').reset_index(drop=True)
+    if kwargs.get('per_term') is not None:
+        df_bursts = df_bursts.groupby('term', sort=False).head(kwargs['per_term']).reset_index(drop=True)
+    if kwargs.get('top_n') is not None:
+        df_bursts = df_bursts.head(kwargs['top_n'])
+    print('Found', len(df_bursts), 'burst windows.')
+    return df_bursts
+
+##################################################################
+
+## EXPORT FUNCTIONS
+
+##################################################################
+
+'''
+    term_file_names: Helper function for d3_exporter(). Writes a unique, file-safe name per term,
+        e.g. '#maquin' to 'maquin'.
+    - Args:
+        - terms= List of terms.
+    - Returns Dict of each term and its file name without extension.
+'''
+def term_file_names(terms):
+    names = {}
+    used = set()
+    for t in terms:
+        name = re.sub(r'[^\w\-]+', '_', str(t).lstrip('#')).strip('_')
+        if len(name) == 0:
+            name = 'term'
+        unique = name
+        n = 1
+        while unique.lower() in used:
+            n += 1
+            unique = name + '_' + str(n)
+        used.add(unique.lower())
+        names[t] = unique
+    return names
+
+'''
+    write_csv_rows: Helper function for d3_exporter(). Streams rows to a CSV file in chunks.
+    - Args:
+        - file_path= String. Path of the CSV file.
+        - header= List of column names.
+        - rows= Iterable of row Lists.
+        - chunk_size= Integer of rows per write.
+'''
+def write_csv_rows(file_path, header, rows, chunk_size):
+    with open(file_path, 'w', newline='') as fh:
+        writer = csv.writer(fh)
+        writer.writerow(header)
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) == chunk_size:
+                writer.writerows(chunk)
+                chunk = []
+        writer.writerows(chunk)
+
+'''
+    group_rows: Helper function for d3_exporter(). Lists the x keys of a hydrated group Dict with their term counts.
+        'period_day' Dicts flatten to one key per Day, with its period.
+    - Args:
+        - group_dict= Hydrated 'day', 'period' or 'period_day' skeleton Dict.
+    - Returns Tuple of a List of key Tuples, e.g. ('1',) or ('1', '2019-01-01'), and a List of their term count Dicts.
+'''
+def group_rows(group_dict):
+    keys = []
+    cells = []
+    for x in group_dict:
+        inner = group_dict[x]
+        if len(inner) > 0 and all(isinstance(v, dict) for v in inner.values()):
+            for d in inner:
+                keys.append((x, d))
+                cells.append(inner[d])
+        else:
+            keys.append((x,))
+            cells.append(inner)
+    depth = set(len(k) for k in keys)
+    if len(depth) > 1 or any(isinstance(v, dict) for c in cells for v in c.values()):
+        raise ValueError('group_dict must be a hydrated day, period or period_day skeleton Dict of term counts.')
+    return keys, cells
+
+'''
+    d3_exporter: Streams a hydrated group Dict straight to D3.js-ready files without building a DataFrame.
+        Rows and columns are written in chunks, so memory stays constant beyond the group Dict itself.
+    - Args:
+        - group_dict= Hydrated 'day', 'period' or 'period_day' skeleton Dict, ```{'1': {'#maquin': 80, ...}, ...}```,
+            from summarizer() with grouped_output_type='dict'. 'period_day' Dicts, ```{'1': {'2019-01-01': {'#maquin': 3, ...}, ...}, ...}```,
+            are written one row per Day, with its period. In a pipeline, reference that summarizer stage,
+            not its skeleton stage, since stages receive copies of skeleton Dicts.
+        - x_col= String. Name of the x column, e.g. 'period' or 'date'. Default is 'period'.
+        - day_col= String. Name of the Day column for 'period_day' Dicts. Default is 'date'.
+        - path= String. Path to save files.
+        - output= String. File name without an extension.
+        - formats= List of file types to write. Default is ['csv', 'json'].
+            - 'csv': The 'spread' layout, one column per term, like grouped_dict_to_df()
+            - 'json': Columnar JSON, ```{"period": ["1", ...], "#maquin": [80, ...], ...}```
+        - chunk_size= Integer of rows or values per write. Default is 1000.
+        - per_term= Boolean. If True, also writes one CSV per term to a directory named after output,
+            with an 'index.json' manifest of term file names for lazy loading in the browser. Default is False.
+        - max_workers= Integer of threads writing per-term files. Default is 4.
+    - Returns Dict of the written file paths.
+'''
+def d3_exporter(**kwargs):
+    keys, cells = group_rows(kwargs['group_dict'])
+    x_cols = [kwargs.get('x_col', 'period')]
+    if len(keys) > 0 and len(keys[0]) == 2:
+        x_cols.append(kwargs.get('day_col', 'date'))
+    formats = kwargs.get('formats', ['csv', 'json'])
+    chunk_size = kwargs.get('chunk_size', 1000)
+    terms = list(cells[0]) if len(cells) > 0 else []
+    written = {}
+
+    if 'csv' in formats:
+        file_path = join(kwargs['path'], kwargs['output'] + '.csv')
+        rows = (list(k) + [c.get(t, 0) for t in terms] for k, c in zip(keys, cells))
+        write_csv_rows(file_path, x_cols + terms, rows, chunk_size)
+        written['csv'] = file_path
+        print('File ', kwargs['output'] + '.csv', ' saved to ', kwargs['path'])
+
+    if 'json' in formats:
+        file_path = join(kwargs['path'], kwargs['output'] + '.json')
+        with open(file_path, 'w') as fh:
+            fh.write('{')
+            for i, name in enumerate(x_cols + terms):
+                fh.write((',' if i > 0 else '') + json.dumps(name) + ':[')
+                for c in range(0, len(keys), chunk_size):
+                    if i < len(x_cols):
+                        values = [k[i] for k in keys[c:c + chunk_size]]
+                    else:
+                        values = [cell.get(name, 0) for cell in cells[c:c + chunk_size]]
+                    fh.write((',' if c > 0 else '') + ','.join(json.dumps(v, default=int) for v in values))
+                fh.write(']')
+            fh.write('}')
+        written['json'] = file_path
+        print('File ', kwargs['output'] + '.json', ' saved to ', kwargs['path'])
+
+    if kwargs.get('per_term', False) == True:
+        term_dir = join(kwargs['path'], kwargs['output'])
+        makedirs(term_dir, exist_ok=True)
+        names = term_file_names(terms)
+
+        def write_term(t):
+            rows = (list(k) + [c.get(t, 0)] for k, c in zip(keys, cells))
+            write_csv_rows(join(term_dir, names[t] + '.csv'), x_cols + ['count'], rows, chunk_size)
+
+        with ThreadPoolExecutor(max_workers=kwargs.get('max_workers', 4)) as executor:
+            list(executor.map(write_term, terms))
+
+        index_path = join(term_dir, 'index.json')
+        with open(index_path, 'w') as fh:
+            json.dump({'x_col': x_cols[0], 'x_cols': x_cols, 'terms': {t: names[t] + '.csv' for t in terms}}, fh)
+        written['per_term'] = index_path
+        print(len(terms), 'term files and index.json saved to ', term_dir)
+
+    return written
+
+##################################################################
+
 ## PLOTTER FUNCTIONS
 
 ##################################################################
@@ -0,0 +1,323 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/python3
+
+# Narrator pipeline: Declarative runner for narrator report stages
+# by Chris Lindgren <chris.a.lindgren@gmail.com>
+# Distributed under the BSD 3-clause license.
+# See LICENSE.txt or http://opensource.org/licenses/BSD-3-Clause for details.
+
+# WHAT IS IT?
+# Reads a JSON spec of narrator stages (period dates, skeletons, summaries, DataFrames and charts),
+# builds a stage graph from their references, and runs independent CPU-bound stages in parallel
+# worker processes that share one loaded copy of the tweet corpus.
+import argparse
+import copy
+import json
+import multiprocessing
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+import pandas as pd
+import matplotlib.pyplot as plt
+from . import narrator as nt
+
+'''
+    Stage types available to a pipeline spec. Each maps to the narrator function
+    that receives the stage's resolved 'options' as its keyword arguments.
+'''
+STAGE_FUNCTIONS = {
+    'period_dates_writer': nt.period_dates_writer,
+    'skeletor': nt.skeletor,
+    'summarizer': nt.summarizer,
+    'grouped_dict_to_df': nt.grouped_dict_to_df,
+    'build_topper': nt.build_topper,
+    'tweeter_stats': nt.tweeter_stats,
+    'term_day_matrix': nt.term_day_matrix,
+    'burst_detector': nt.burst_detector,
+    'd3_exporter': nt.d3_exporter,
+    'multiline_plotter': nt.multiline_plotter,
+    'bar_plotter': nt.bar_plotter
+}
+
+# CPU-bound stages, which hold the GIL, and pyplot renders, which keep global figure state,
+# run in worker processes. The rest are light and run in a thread of the main process.
+PROCESS_STAGES = ['summarizer', 'build_topper', 'tweeter_stats', 'term_day_matrix', 'burst_detector',
+                  'multiline_plotter', 'bar_plotter']
+
+# Stages that receive the shared corpus when 'df_corpus' is not set in their options
+CORPUS_STAGES = ['summarizer', 'build_topper', 'tweeter_stats']
+
+'''
+    load_pipeline_spec: Reads a pipeline spec from a JSON file.
+    - Args:
+        - path= String. Path to the JSON spec.
+    - Returns Dict of the pipeline spec.
+'''
+def load_pipeline_spec(path):
+    with open(path, 'r') as fh:
+        return json.load(fh)
+
+'''
+    _references: Helper function for run_pipeline(). Collects the '@stage' references in a stage's options.
+'''
+def _references(value):
+    refs = set()
+    if isinstance(value, str) and value.startswith('@'):
+        refs.add(value[1:])
+    elif isinstance(value, dict):
+        for v in value.values():
+            refs.update(_references(v))
+    elif isinstance(value, list):
+        for v in value:
+            refs.update(_references(v))
+    return refs
+
+'''
+    _resolve: Helper function for run_pipeline(). Swaps '@stage' references for stage outputs.
+        DataFrames, like the corpus, are shared as-is. Other outputs are copied, since
+        grouper() hydrates skeleton Dicts in place and concurrent stages may share one.
+        References missing from results, like '@corpus' for a worker process, are left as they are.
+'''
+def _resolve(value, results):
+    if isinstance(value, str) and value.startswith('@'):
+        if value[1:] not in results:
+            return value
+        output = results[value[1:]]
+        if isinstance(output, pd.DataFrame):
+            return output
+        return copy.deepcopy(output)
+    elif isinstance(value, dict):
+        return {k: _resolve(v, results) for k, v in value.items()}
+    elif isinstance(value, list):
+        return [_resolve(v, results) for v in value]
+    return value
+
+'''
+    _load_corpus: Helper function for run_pipeline(). Reads the corpus from the spec's 'corpus' entry.
+'''
+def _load_corpus(corpus_spec):
+    return pd.read_csv(corpus_spec['path'], **corpus_spec.get('read_csv', {}))
+
+'''
+    _timed_call: Helper function for run_pipeline(). Runs a stage function and times it within the worker.
+'''
+def _timed_call(func, options):
+    start = time.perf_counter()
+    output = func(**options)
+    return output, time.perf_counter() - start
+
+# Corpus spec and the corpus itself. Forked workers inherit the parent's corpus.
+_worker_state = {'corpus_spec': None, 'corpus': None}
+
+'''
+    _init_worker: Helper function for run_pipeline(). Sets up a worker process with a non-interactive
+        pyplot backend and the corpus spec to load from, if it did not inherit the corpus.
+'''
+def _init_worker(corpus_spec):
+    plt.switch_backend('Agg')
+    _worker_state['corpus_spec'] = corpus_spec
+
+'''
+    _worker_ready: Helper function for run_pipeline(). A no-op task that starts the worker processes.
+'''
+def _worker_ready():
+    return True
+
+'''
+    _worker_call: Helper function for run_pipeline(). Runs a stage in a worker process against the corpus
+        it inherited from the parent, so the corpus is never pickled. Without fork, the worker reads the corpus
+        from its path on its first '@corpus' stage and keeps it for the next.
+'''
+def _worker_call(func, options):
+    if 'corpus' in _references(options):
+        if _worker_state['corpus'] is None:
+            _worker_state['corpus'] = _load_corpus(_worker_state['corpus_spec'])
+        options = _resolve(options, {'corpus': _worker_state['corpus']})
+    return _timed_call(func, options)
+
+'''
+    _process_context: Helper function for run_pipeline(). Forks worker processes, so they share the parent's
+        corpus copy-on-write. Falls back to spawn where fork is missing, e.g. on Windows.
+'''
+def _process_context():
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('fork')
+    return multiprocessing.get_context('spawn')
+
+'''
+    run_pipeline: Runs a declarative pipeline of narrator stages. Stages start as soon as every stage
+        they reference has finished. CPU-bound stages (summaries, tops, bursts) and chart renders run in
+        parallel worker processes, which each read the corpus from its path once. Light stages, like
+        period dates and skeletons, run in a thread of the main process.
+    - Args:
+        - spec= Dict or String path to a JSON spec in the following structure:
+            {
+                "corpus": {"path": "tweets.csv", "read_csv": {"dtype": {"id": "str"}}},
+                "max_workers": 4,
+                "summary_path": "run_summary.json",
+                "stages": [
+                    {"name": "periods", "type": "period_dates_writer", "options": {"ranges": [...]}},
+                    {"name": "skel", "type": "skeletor",
+                        "options": {"aggregate_level": "period", "date_range": "@periods", "keys": [...]}},
+                    {"name": "liberal", "type": "summarizer",
+                        "options": {"skeleton": "@skel", "period_dates": "@periods", ...}},
+                    {"name": "liberal_chart", "type": "multiline_plotter", "options": {"df": "@liberal", ...}}
+                ]
+            }
+            - Option values in the form '@name' are replaced with the output of stage 'name'.
+              '@corpus' is the corpus read from the 'corpus' entry.
+            - 'depends_on'= Optional List of stage names to wait on without passing their output.
+            - 'to_csv'= Optional String path to save a DataFrame output.
+        - max_workers= Optional Integer. Overrides the spec's 'max_workers' (Default is 4).
+    - Returns Dict with 'results', the output per stage, and 'summary', the status and seconds per stage.
+        The summary is saved to 'summary_path' even when a stage fails.
+'''
+def run_pipeline(spec, max_workers=None):
+    if isinstance(spec, str):
+        spec = load_pipeline_spec(spec)
+    if max_workers == None:
+        max_workers = spec.get('max_workers', 4)
+
+    run_start = time.perf_counter()
+    results = {}
+    summary = {'stages': {}, 'total_seconds': None}
+
+    # 1. Build the stage graph
+    stages = {}
+    dependencies = {}
+    for s in spec['stages']:
+        if s['name'] in stages or s['name'] == 'corpus':
+            raise ValueError('Duplicate pipeline stage name: ' + s['name'])
+        if s['type'] not in STAGE_FUNCTIONS:
+            raise ValueError('Unknown pipeline stage type: ' + s['type'])
+        options = s.get('options', {})
+        if s['type'] in CORPUS_STAGES and 'df_corpus' not in options:
+            options = dict(options, df_corpus='@corpus')
+        stages[s['name']] = dict(s, options=options)
+        dependencies[s['name']] = _references(options) | set(s.get('depends_on', []))
+
+    finished = {'corpus'} if 'corpus' in spec else set()
+    known = set(stages) | finished
+    for name in dependencies:
+        missing = dependencies[name] - known
+        if len(missing) > 0:
+            raise ValueError('Stage ' + name + ' references unknown stages: ' + ', '.join(sorted(missing)))
+
+    # 2. Load the corpus once, before the workers fork, so they all share it
+    if 'corpus' in spec:
+        print('Loading corpus from', spec['corpus']['path'])
+        start = time.perf_counter()
+        results['corpus'] = _load_corpus(spec['corpus'])
+        summary['stages']['corpus'] = {
+            'type': 'corpus',
+            'depends_on': [],
+            'status': 'done',
+            'seconds': round(time.perf_counter() - start, 3)
+        }
+
+    # 3. Run each stage once its dependencies are done
+    pending = dict(stages)
+    running = {}
+    context = _process_context()
+    if context.get_start_method() == 'fork':
+        _worker_state['corpus'] = results.get('corpus')
+    workers = ProcessPoolExecutor(max_workers=max_workers, mp_context=context,
+                                  initializer=_init_worker, initargs=(spec.get('corpus'),))
+    # A forking pool starts every worker on its first task, so start them before any stage thread runs
+    workers.submit(_worker_ready).result()
+    _worker_state['corpus'] = None
+    threads = ThreadPoolExecutor(max_workers=max_workers)
+    failed = False
+    try:
+        while len(pending) > 0 or len(running) > 0:
+            ready = [n for n in pending if dependencies[n] <= finished]
+            for name in ready:
+                s = pending.pop(name)
+                in_worker = s['type'] in PROCESS_STAGES
+                # Worker processes swap '@corpus' for their shared copy
+                shared = {k: results[k] for k in results if not (in_worker and k == 'corpus')}
+                options = _resolve(s.get('options', {}), shared)
+                if s['type'] == 'bar_plotter':
+                    options.setdefault('ax', None)
+                print('Starting stage', name, '(' + s['type'] + ')')
+                if in_worker:
+                    future = workers.submit(_worker_call, STAGE_FUNCTIONS[s['type']], options)
+                else:
+                    future = threads.submit(_timed_call, STAGE_FUNCTIONS[s['type']], options)
+                running[future] = name
+
+            if len(running) == 0:
+                raise ValueError('Pipeline stages have circular references: ' + ', '.join(sorted(pending)))
+
+            done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                s = stages[name]
+                try:
+                    output, seconds = future.result()
+                except Exception:
+                    summary['stages'][name] = {
+                        'type': s['type'],
+                        'depends_on': sorted(dependencies[name]),
+                        'status': 'failed',
+                        'seconds': None
+                    }
+                    raise
+                results[name] = output
+                finished.add(name)
+                if 'to_csv' in s and isinstance(output, pd.DataFrame):
+                    output.to_csv(s['to_csv'], index=False)
+                summary['stages'][name] = {
+                    'type': s['type'],
+                    'depends_on': sorted(dependencies[name]),
+                    'status': 'done',
+                    'seconds': round(seconds, 3)
+                }
+                print('Finished stage', name, 'in', round(seconds, 3), 'seconds')
+    except BaseException:
+        failed = True
+        raise
+    finally:
+        # Record the stages a failure left unfinished, then save the summary before waiting on workers
+        for status, names in [('cancelled', running.values()), ('not run', pending)]:
+            for name in names:
+                summary['stages'][name] = {
+                    'type': stages[name]['type'],
+                    'depends_on': sorted(dependencies[name]),
+                    'status': status,
+                    'seconds': None
+                }
+        summary['total_seconds'] = round(time.perf_counter() - run_start, 3)
+        if 'summary_path' in spec:
+            with open(spec['summary_path'], 'w') as fh:
+                json.dump(summary, fh, indent=2)
+            print('Run summary saved to', spec['summary_path'])
+        threads.shutdown(wait=not failed, cancel_futures=True)
+        workers.shutdown(wait=not failed, cancel_futures=True)
+
+    print('\n\nPipeline complete in', summary['total_seconds'], 'seconds')
+    for name in summary['stages']:
+        print(' -', name, '(' + summary['stages'][name]['type'] + '):', summary['stages'][name]['seconds'], 'seconds')
+
+    return {'results': results, 'summary': summary}
+
+'''
+    main: Console entry point for 'narrator-pipeline'.
+'''
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='narrator-pipeline',
+        description='Run a narrator report pipeline from a JSON spec.'
+    )
+    parser.add_argument('spec', help='Path to the JSON pipeline spec.')
+    parser.add_argument('--workers', type=int, default=None, help='Maximum concurrent stages per executor.')
+    parser.add_argument('--summary', default=None, help='Path to save the JSON run summary.')
+    args = parser.parse_args(argv)
+
+    spec = load_pipeline_spec(args.spec)
+    if args.summary != None:
+        spec['summary_path'] = args.summary
+    run_pipeline(spec, max_workers=args.workers)
+    return 0
+
+if __name__ == '__main__':
+    raise SystemExit(main())
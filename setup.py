@@ -16,5 +16,8 @@ setup(
   install_requires = ['pandas', 'numpy', 'emoji', 'nltk', 'matplot'],
   keywords = ['data processing', 'descriptive statistics', 'data narratives', 'temporal charts'],
   classifiers = [],
-  include_package_data=True
+  include_package_data=True,
+  entry_points = {
+    'console_scripts': ['narrator-pipeline=narrator.pipeline:main']
+  }
 )